@@ -14,12 +14,12 @@ from colorama import Back
 
 # Constants for the game
 MAX_STACK_SIZE = 4
-QUIT_COMMAND = ["Q", "QUIT", "EXIT"]
-RESET_COMMAND = ["R", "RESET"]
-HINT_COMMAND = ["H", "HINT"]
-NEW_COMMAND = ["N", "NEW"]
-INFO_COMMAND = ["I", "HELP"]
-UNDO_COMMAND = ["U", "UNDO"]
+QUIT_COMMAND = frozenset({"Q", "QUIT", "EXIT"})
+RESET_COMMAND = frozenset({"R", "RESET"})
+HINT_COMMAND = frozenset({"H", "HINT"})
+NEW_COMMAND = frozenset({"N", "NEW"})
+INFO_COMMAND = frozenset({"I", "HELP"})
+UNDO_COMMAND = frozenset({"U", "UNDO"})
 COPYRIGHT = "SHOW C"
 WARRANTY = "SHOW W"
 
@@ -35,6 +35,12 @@ COLORS = [
     Back.YELLOW+"   "+Back.RESET,
     Back.WHITE+"   "+Back.RESET
 ]
+# Stacks hold indices into COLORS; the ANSI strings are only used when rendering.
+COLOR_IDS = list(range(len(COLORS)))
+
+# Constants for the solver
+MAX_SOLVE_MOVES = 100  # best_solve gives up on boards that need more moves than this
+MAX_SOLVE_STATES = 200_000  # boards remembered per solve; beyond this it searches without memory
 
 # ANSI escape codes for alternate screen
 ALT_SCREEN_ON = "\033[?1049h"
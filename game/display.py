@@ -12,10 +12,11 @@ See the GNU General Public License for more details.
 
 import os
 import random
+import sys
 
 from tabulate import tabulate
 from colorama import Fore
-from game.constants import MAX_STACK_SIZE, icon
+from game.constants import COLORS, MAX_STACK_SIZE, icon
 
 def welcome():
     """
@@ -56,7 +57,20 @@ def show_stacks(stacks):
     Displays the current state of the stacks in a tabular format.
 
     Args:
-        stacks (list of lists): The current state of the game stacks.
+        stacks (list of lists): The current state of the game stacks (color ids).
+    """
+    sys.stdout.write(format_stacks(stacks) + "\n")
+
+
+def format_stacks(stacks) -> str:
+    """
+    Renders the stacks as a table, with the top of each stack on top.
+
+    Args:
+        stacks (list of lists): The current state of the game stacks (color ids).
+
+    Returns:
+        str: The table, ready to be written to the terminal.
     """
     max_height = max(len(stack) for stack in stacks)
     table = []
@@ -64,7 +78,7 @@ def show_stacks(stacks):
     for i in range(max_height - 1, -1, -1):
         row = []
         for stack in stacks:
-            row.append(stack[i] if i < len(stack) else " ")
+            row.append(COLORS[stack[i]] if i < len(stack) else " ")
         table.append(row)
 
     stack_labels = [i + 1 for i in range(len(stacks))]
@@ -72,7 +86,7 @@ def show_stacks(stacks):
     table.append(sep)
     table.append(stack_labels)
 
-    print(tabulate(table, tablefmt="rounded_outline", stralign="center", numalign="center"))
+    return tabulate(table, tablefmt="rounded_outline", stralign="center", numalign="center")
 
 
 def prompts(context="error") -> str:
@@ -136,17 +150,3 @@ def show_warranty():
     print("\n"+Fore.GREEN+"""This is free software; see the source code for copying 
 conditions. There is ABSOLUTELY NO WARRANTY; not even for 
 MERCHANTABILITY  or FITNESS FOR A PARTICULAR PURPOSE."""+Fore.RESET+"\n")
-
-if __name__ == "__main__":
-    # Example usage
-    example_stacks = [
-        ["A", "B", "C"],
-        ["B", "C"],
-        ["A"],
-        []
-    ]
-    show_stacks(example_stacks)
-    print(prompts(context="error"))
-    print(prompts(context="restart"))
-    print(prompts(context="transition"))
-    print(prompts(context="repeat"))
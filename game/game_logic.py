@@ -12,10 +12,29 @@ See the GNU General Public License for more details.
 
 import random
 import re
-from copy import deepcopy
 
 from game.constants import *
 
+# Zobrist keys for every (slot, color) pair. A stack hashes to the XOR of the keys of its cells
+# and a board to the sum of its stack hashes, so moves update it incrementally and the hash
+# does not depend on the order of the stacks.
+_ZOBRIST_RANDOM = random.Random(0)
+_ZOBRIST = [[_ZOBRIST_RANDOM.getrandbits(64) for _ in COLORS] for _ in range(MAX_STACK_SIZE)]
+_HASH_MASK = (1 << 64) - 1
+
+# Solutions found so far, keyed by compress_state of every board along each solution,
+# so hints for positions on a known solution line do not search again.
+_solutions = {}
+_SOLUTIONS_LIMIT = 100_000
+
+# Separators accepted between the two stack numbers of a move, e.g. "1-2", "1,2", "1 2", "1->2"
+_MOVE_SPLIT = re.compile(r'->|[,\-\s]')
+
+
+def _snapshot(stacks: list[list]) -> list[list]:
+    """Copies the stacks. Their contents are immutable color ids, so copying each list is enough."""
+    return [stack[:] for stack in stacks]
+
 
 def initialize_game(num_stacks : int = None) -> list[list]:
     """
@@ -26,34 +45,34 @@ def initialize_game(num_stacks : int = None) -> list[list]:
         Defaults to a random number between MIN_STACKS and MAX_STACKS.
 
     Returns:
-        list of lists: A list of stacks representing the game state.
+        list of lists: A list of stacks of color ids representing the game state.
     """
     if num_stacks is None:
         num_stacks = random.randint(MIN_STACKS, MAX_STACKS)
 
     # Choose a subset of colors based on the number of stacks
     num_colors = num_stacks - 2
-    selected_colors = COLORS[:num_colors]
+    selected_colors = COLOR_IDS[:num_colors]
 
     # Create a pool of colors with each appearing exactly MAX_STACK_SIZE times
     color_pool = selected_colors * MAX_STACK_SIZE
     random.shuffle(color_pool)
 
-    # Generate stacks and ensure no stack is fully uniform
-    stacks = []
-    while color_pool:
-        stack = []
-        while len(stack) < MAX_STACK_SIZE and color_pool:
-            color = color_pool.pop()
-            stack.append(color)
-
-        # Validate stack uniformity
-        if len(set(stack)) == 1:
-            color_pool.extend(stack)
-            random.shuffle(color_pool)
-            continue
+    # Deal the pool into full stacks
+    stacks = [color_pool[i:i + MAX_STACK_SIZE] for i in range(0, len(color_pool), MAX_STACK_SIZE)]
 
-        stacks.append(stack)
+    # Break up any fully uniform stack by swapping one of its colors with a different color
+    # from another stack. That stack cannot become uniform in turn, since it would need more
+    # than MAX_STACK_SIZE cells of the swapped-in color, so a single pass is enough.
+    for stack in stacks:
+        if len(set(stack)) != 1:
+            continue
+        color = stack[0]
+        candidates = [(other, j) for other in stacks if other is not stack
+                      for j, cell in enumerate(other) if cell != color]
+        other, j = random.choice(candidates)
+        i = random.randrange(MAX_STACK_SIZE)
+        stack[i], other[j] = other[j], stack[i]
 
     # Add empty stacks for player moves
     for _ in range(2):
@@ -62,9 +81,10 @@ def initialize_game(num_stacks : int = None) -> list[list]:
     return stacks
 
 
-def process_move(stacks: list[list], source, destination, previous_state = []) -> tuple:
+def process_move(stacks: list[list], source, destination) -> bool:
     """
     Moves a letter from the source stack to the destination stack if valid.
+    The stacks are changed in place; callers that support undo snapshot them beforehand.
 
     Args:
         stacks: The list of stacks.
@@ -79,9 +99,7 @@ def process_move(stacks: list[list], source, destination, previous_state = []) -
     destination_stack = stacks[destination]
 
     if not source_stack or len(destination_stack) == MAX_STACK_SIZE or source == destination:
-        return flag, previous_state  # Cannot move from an empty stack or to stack of max length or to the same stack
-
-    initial_state = deepcopy(stacks)
+        return flag  # Cannot move from an empty stack or to stack of max length or to the same stack
 
     while ((not destination_stack or source_stack[-1] == destination_stack[-1]) and
            len(destination_stack) != MAX_STACK_SIZE):
@@ -90,15 +108,12 @@ def process_move(stacks: list[list], source, destination, previous_state = []) -
         if not source_stack:
             break
 
-    if flag:
-        previous_state = initial_state
-
-    return flag, previous_state  # Invalid move if colors don't match
+    return flag  # Invalid move if colors don't match
 
 
 def parse_move(command: str) -> tuple[int, int]:
     """Parses the player's move command."""
-    command = list(filter(str.strip, re.split(r'->|[,\-\s]', command)))
+    command = [part for part in _MOVE_SPLIT.split(command) if part.strip()]
     if len(command) != 2:
         raise ValueError("Invalid move format.")
 
@@ -123,75 +138,256 @@ def provide_hint(stacks: list[list]) -> str:
     return "\n> No valid moves. Consider undoing or restarting.\n"
 
 
-def best_solve(initial_stacks: list[list]) -> list[tuple[int, int]] | None:
+def compress_state(stacks: list[list]) -> tuple:
+    """Converts the stacks into a hashable tuple of tuples."""
+    return tuple(tuple(stack) for stack in stacks)
+
+
+def heuristic_score(stacks: list[list]) -> int:
     """
-    Finds the best move sequence to solve the game using heuristic-based A* search.
-    Args:
-        initial_stacks: The initial game stacks
-    Returns:
-        list: best moves, or None if unsolvable
+    Lower bound on the moves left. Every color run above the bottom one has to be moved off
+    its stack, and when several stacks share a bottom color all but one of them must be
+    emptied. A single move lifts at most one run, so this never overestimates.
     """
-    from copy import deepcopy
-    from heapq import heappush, heappop
+    score = 0
+    bottoms = set()
+    for stack in stacks:
+        if not stack:
+            continue
+        if stack[0] in bottoms:
+            score += 1
+        bottoms.add(stack[0])
+        score += stack_breaks(stack)
+    return score
+
+
+def stack_breaks(stack: list) -> int:
+    """Counts the places where the color changes going up a stack (0 means it is uniform)."""
+    return sum(1 for i in range(1, len(stack)) if stack[i] != stack[i - 1])
+
+
+def _is_unfinished(height: int, breaks: int) -> bool:
+    """True if a stack of this height and stack_breaks still stands in the way of check_win_condition."""
+    return height != 0 and (breaks != 0 or height != MAX_STACK_SIZE)
 
-    def compress_state(stacks: list[list]) -> tuple:
-        return tuple(tuple(stack) for stack in stacks)
 
-    def heuristic_score(stacks: list[list]) -> int:
-        score = 0
-        for stack in stacks:
-            if not stack:
+def get_valid_moves(stacks: list[list], breaks: list[int], previous_move=None) -> list[tuple[int, int]]:
+    """
+    Lists the (source, destination) moves worth trying from a state.
+    Empty stacks and identical source stacks are interchangeable, so only the first of each is used.
+    breaks holds stack_breaks for every stack.
+    """
+    moves = []
+    seen_sources = set()
+    for source_index, source_stack in enumerate(stacks):
+        if not source_stack:
+            continue
+        source_key = tuple(source_stack)
+        if source_key in seen_sources:
+            continue
+        seen_sources.add(source_key)
+        clean_stack_flag = breaks[source_index] == 0
+        empty_tried = False
+        for destination_index, destination_stack in enumerate(stacks):
+            if source_index == destination_index:
                 continue
-            if len(set(stack)) > 1:
-                score += len(set(stack))  # More mixed colors, worse
-            if len(stack) < MAX_STACK_SIZE:
-                score += 1  # Penalize incomplete tubes
-        return score
-
-    def get_valid_moves(stacks: list[list], previous_move=None) -> list[tuple[int, int]]:
-        moves = []
-        for source_index, source_stack in enumerate(stacks):
-            if not source_stack:
+            if previous_move and previous_move[0] == destination_index and previous_move[1] == source_index:
                 continue
-            clean_stack_flag = all(x == source_stack[0] for x in source_stack)
-            for destination_index, destination_stack in enumerate(stacks):
-                if source_index == destination_index:
-                    continue
-                if previous_move and previous_move[0] == destination_index and previous_move[1] == source_index:
-                    continue
-                if clean_stack_flag and (not destination_stack or
-                                         (MAX_STACK_SIZE - len(destination_stack)) < len(source_stack)):
+            if clean_stack_flag and (not destination_stack or
+                                     (MAX_STACK_SIZE - len(destination_stack)) < len(source_stack)):
+                continue
+            if not destination_stack:
+                if empty_tried:
                     continue
-                if ((not destination_stack or source_stack[-1] == destination_stack[-1]) and
-                        len(destination_stack) < MAX_STACK_SIZE):
-                    moves.append((source_index, destination_index))
-        return moves
+                empty_tried = True
+                moves.append((source_index, destination_index))
+            elif source_stack[-1] == destination_stack[-1] and len(destination_stack) < MAX_STACK_SIZE:
+                moves.append((source_index, destination_index))
+    return moves
+
+
+def apply_move(stacks: list[list], src: int, dst: int) -> int:
+    """Moves the matching top colors from src to dst in place, returning how many were moved."""
+    source_stack, destination_stack = stacks[src], stacks[dst]
+    top = source_stack[-1]
+    run = 1
+    while run < len(source_stack) and source_stack[-1 - run] == top:
+        run += 1
+    count = min(run, MAX_STACK_SIZE - len(destination_stack))
+
+    del source_stack[-count:]
+    destination_stack.extend([top] * count)
+    return count
+
+
+def undo_move(stacks: list[list], src: int, dst: int, count: int) -> None:
+    """Reverts apply_move by handing the moved colors back from dst to src."""
+    source_stack, destination_stack = stacks[src], stacks[dst]
+    source_stack.extend(destination_stack[-count:])
+    del destination_stack[-count:]
 
-    visited = set()
-    heap = []
-    initial_score = heuristic_score(initial_stacks)
-    heappush(heap, (initial_score, 0, initial_stacks, []))
 
-    while heap:
-        score, depth, stacks, path = heappop(heap)
-        state_key = compress_state(stacks)
+def stack_hash(stack: list) -> int:
+    """Zobrist hash of a single stack."""
+    value = 0
+    for slot, color in enumerate(stack):
+        value ^= _ZOBRIST[slot][color]
+    return value
 
-        if state_key in visited:
+
+def _run_hash(start: int, count: int, color: int) -> int:
+    """Zobrist contribution of count cells of one color starting at slot start."""
+    value = 0
+    for slot in range(start, start + count):
+        value ^= _ZOBRIST[slot][color]
+    return value
+
+
+def best_solve(initial_stacks: list[list], max_moves: int = MAX_SOLVE_MOVES) -> list[tuple[int, int]] | None:
+    """
+    Finds the shortest move sequence to solve the game using IDA* search.
+    A single board is searched depth-first and every move is undone on backtrack,
+    so no state is ever copied. heuristic_score is admissible and consistent, so the first
+    solution found within the threshold has the fewest moves. States are tracked by an
+    incrementally updated 64-bit Zobrist hash in a g_score table shared by all passes, so a
+    state is only searched again when it is reached in fewer moves than before. The table is
+    capped at MAX_SOLVE_STATES boards, after which the search only needs memory for its path.
+    Results are remembered for the session, see _remember_solution.
+    Args:
+        initial_stacks: The initial game stacks
+        max_moves: Give up once every solution would need more moves than this
+    Returns:
+        list: best moves, or None if unsolvable (within max_moves)
+    """
+    cached = _solutions.get(compress_state(initial_stacks))
+    if cached is not None:
+        return list(cached)
+
+    stacks = _snapshot(initial_stacks)
+    if check_win_condition(stacks):
+        return []
+
+    g_score = {}
+    threshold = heuristic_score(stacks)
+    while True:
+        result = _bounded_search(stacks, threshold, g_score)
+        if isinstance(result, list):
+            _remember_solution(initial_stacks, result)
+            return result
+        if result is None or result > max_moves:
+            return None
+        threshold = result
+
+
+def _remember_solution(initial_stacks: list[list], moves: list[tuple[int, int]]) -> None:
+    """Caches the remaining moves for every board reached while playing out a solution."""
+    if len(_solutions) + len(moves) > _SOLUTIONS_LIMIT:
+        _solutions.clear()
+
+    stacks = _snapshot(initial_stacks)
+    for i, move in enumerate(moves):
+        _solutions[compress_state(stacks)] = tuple(moves[i:])
+        apply_move(stacks, *move)
+
+
+def _bounded_search(stacks: list[list], threshold: int, g_score: dict) -> list[tuple[int, int]] | int | None:
+    """
+    Depth-first search of every move sequence whose estimated length stays within threshold.
+
+    g_score maps board hashes to (fewest moves reached in, threshold of the pass that expanded
+    it). A board reached in more moves is skipped: with a consistent heuristic the shorter route
+    to it also fits within this and every later threshold. A board reached in the same number
+    of moves is only skipped if this pass already expanded it.
+
+    Returns:
+        list: the moves that solve the game, or int: the smallest estimate that exceeded
+        threshold (the next one to try), or None if there is nothing left to search.
+    """
+    path = []
+    # Everything needed to roll back each move on the path:
+    # (moved count, board hash, source hash, destination hash, score, source breaks removed, bottom shift,
+    #  unfinished count)
+    trail = []
+    stack_hashes = [stack_hash(stack) for stack in stacks]
+    board_hash = sum(stack_hashes) & _HASH_MASK
+    # Per-stack metadata kept up to date by every move, so the heuristic is never rescanned
+    breaks = [stack_breaks(stack) for stack in stacks]
+    bottoms = [0] * len(COLORS)  # number of stacks with each color at the bottom
+    for stack in stacks:
+        if stack:
+            bottoms[stack[0]] += 1
+    score = heuristic_score(stacks)
+    # The board is solved once no stack is unfinished, so the win check is a counter compare
+    unfinished = sum(_is_unfinished(len(stack), b) for stack, b in zip(stacks, breaks))
+    g_score[board_hash] = (0, threshold)
+    frames = [iter(get_valid_moves(stacks, breaks))]
+    next_threshold = None
+
+    while frames:
+        move = next(frames[-1], None)
+        if move is None:
+            # Every move from this node is exhausted, backtrack to its parent
+            frames.pop()
+            if path:
+                src, dst = path.pop()
+                color = stacks[dst][-1]
+                (count, board_hash, stack_hashes[src], stack_hashes[dst],
+                 score, removed, shift, unfinished) = trail.pop()
+                breaks[src] += removed
+                bottoms[color] -= shift
+                undo_move(stacks, src, dst, count)
             continue
-        visited.add(state_key)
 
-        if check_win_condition(stacks):
-            return path
+        src, dst = move
+        count = apply_move(stacks, src, dst)
+        color = stacks[dst][-1]
+
+        # The destination's top already matched (or it was empty), so only the source can lose a
+        # break, and only emptying the source or filling an empty destination moves a bottom color.
+        source_stack = stacks[src]
+        removed = 1 if source_stack and source_stack[-1] != color else 0
+        emptied = not source_stack
+        filled = len(stacks[dst]) == count
+        new_score = score - removed
+        if emptied and bottoms[color] > 1:
+            new_score -= 1
+        if filled and bottoms[color] - emptied > 0:
+            new_score += 1
+
+        depth = len(path) + 1
+        estimate = depth + new_score
+        source_hash = stack_hashes[src] ^ _run_hash(len(source_stack), count, color)
+        destination_hash = stack_hashes[dst] ^ _run_hash(len(stacks[dst]) - count, count, color)
+        new_hash = (board_hash - stack_hashes[src] - stack_hashes[dst]
+                    + source_hash + destination_hash) & _HASH_MASK
+        best = g_score.get(new_hash)
+        if (best is not None and (best[0] < depth or best == (depth, threshold))) or estimate > threshold:
+            if estimate > threshold and (next_threshold is None or estimate < next_threshold):
+                next_threshold = estimate
+            undo_move(stacks, src, dst, count)
+            continue
 
-        for move in get_valid_moves(stacks, path[-1] if path else None):
-            src, dst = move
-            new_stacks = deepcopy(stacks)
-            success, _ = process_move(new_stacks, src, dst)
-            if success:
-                new_score = heuristic_score(new_stacks)
-                heappush(heap, (new_score + depth + 1, depth + 1, new_stacks, path + [move]))
+        shift = filled - emptied
+        path.append(move)
+        trail.append((count, board_hash, stack_hashes[src], stack_hashes[dst],
+                      score, removed, shift, unfinished))
+        board_hash, stack_hashes[src], stack_hashes[dst] = new_hash, source_hash, destination_hash
+        score = new_score
+        # Only the two stacks involved can change state; the destination keeps its breaks
+        source_height, destination_height = len(source_stack), len(stacks[dst])
+        unfinished -= (_is_unfinished(source_height + count, breaks[src])
+                       + _is_unfinished(destination_height - count, breaks[dst]))
+        breaks[src] -= removed
+        bottoms[color] += shift
+        unfinished += (_is_unfinished(source_height, breaks[src])
+                       + _is_unfinished(destination_height, breaks[dst]))
+        if not unfinished:
+            return path
+        if len(g_score) < MAX_SOLVE_STATES or board_hash in g_score:
+            g_score[board_hash] = (depth, threshold)
+        frames.append(iter(get_valid_moves(stacks, breaks, move)))
 
-    return None
+    return next_threshold
 
 def rate_solution(user_moves, optimal_moves):
     if user_moves <= optimal_moves:
@@ -199,10 +395,3 @@ def rate_solution(user_moves, optimal_moves):
     ratio = optimal_moves / user_moves
     stars = 5 * ratio
     return int(max(1.0, round(stars, 1)))  # Ensure at least 1 star
-
-
-if __name__ == "__main__":
-    # Example usage
-    stacks = initialize_game()
-    for i, stack in enumerate(stacks):
-        print(f"Stack {i + 1}: {stack}")
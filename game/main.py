@@ -11,92 +11,130 @@ See the GNU General Public License for more details.
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 from game.display import *
 from game.game_logic import *
+from game.game_logic import _snapshot
 from game.constants import *
 
 
 def main():
     """Main function to run the game."""
-    from copy import deepcopy
+    # Solves each new board in the background while the player is reading or moving;
+    # the result is only waited for on the win screen.
+    solver = ThreadPoolExecutor(max_workers=1)
 
     def initialize():
         stacks = initialize_game()
+        best_solve_future = solver.submit(best_solve, _snapshot(stacks))
 
-        return stacks, deepcopy(stacks), deepcopy(stacks), len(best_solve(stacks)), [], True
+        return stacks, _snapshot(stacks), _snapshot(stacks), best_solve_future, [], True
+
+    def quit_game():
+        return True
+
+    def reset_game():
+        nonlocal stacks
+        stacks = _snapshot(original_stacks)
+        print("\n> Game reset!")
+        print(f"> {prompts(context='restart')}\n")
+
+    def show_hint():
+        hint = provide_hint(stacks)
+        print(hint)
+        sleep(1)
+
+    def new_game():
+        nonlocal stacks, original_stacks, previous_state, best_solve_future, moves, new
+        stacks, original_stacks, previous_state, best_solve_future, moves, new = initialize()
+        print("\n> New game!\n")
+
+    def show_info():
+        print()
+        how_to_play()
+        sleep(3)
+
+    def undo():
+        nonlocal stacks
+        print()
+        if moves:
+            moves.pop()
+            stacks = _snapshot(previous_state)
+
+    # Every command word mapped to its handler; a handler returning True ends the game loop
+    handlers = {
+        command: handler
+        for commands, handler in [
+            (QUIT_COMMAND, quit_game),
+            (RESET_COMMAND, reset_game),
+            (HINT_COMMAND, show_hint),
+            (NEW_COMMAND, new_game),
+            (INFO_COMMAND, show_info),
+            (UNDO_COMMAND, undo),
+            ((COPYRIGHT,), show_copyright),
+            ((WARRANTY,), show_warranty),
+        ]
+        for command in commands
+    }
 
     try:
         # Enable alternate screen buffer
         sys.stdout.write(ALT_SCREEN_ON)
         sys.stdout.flush()
+        stacks, original_stacks, previous_state, best_solve_future, moves, new = initialize()
         player_name=welcome()
 
-        stacks, original_stacks, previous_state, best_solve_count, moves, new = initialize()
-
         while True:
-            show_stacks(stacks)
+            # Each frame is collected and written to the terminal in one go
+            frame = [format_stacks(stacks), "\n"]
             if check_win_condition(stacks):
-                print(f"\n> Congratulations, {player_name}! You solved the game.")
-                print(f"\n> Best solve: {best_solve_count}")
-                print(f"> Your solve: {len(moves)}")
-                print('\n',Fore.YELLOW+(rate_solution(len(moves),best_solve_count) * '⭐')+Fore.WHITE)
+                best_solve_count = len(best_solve_future.result() or [])
+                frame.append(f"\n> Congratulations, {player_name}! You solved the game.\n")
+                frame.append(f"\n> Best solve: {best_solve_count}\n")
+                frame.append(f"> Your solve: {len(moves)}\n")
+                frame.append('\n '+Fore.YELLOW+(rate_solution(len(moves),best_solve_count) * '⭐')+Fore.WHITE+'\n')
+                sys.stdout.write("".join(frame))
+                sys.stdout.flush()
                 new = input(f"\n> {prompts(context='repeat')}[Y/n]\n> ").strip().upper()
                 if new not in ['Y', '']:
                     break
                 else:
-                    stacks, original_stacks, previous_state, best_solve_count, moves, new = initialize()
+                    stacks, original_stacks, previous_state, best_solve_future, moves, new = initialize()
                     print("\n> New game!\n")
                     continue
 
             if new:
-                print(f"\n> {prompts(context='new')}")
+                frame.append(f"\n> {prompts(context='new')}\n")
                 new = False
             else:
-                print(f"\n> {prompts(context='transition')}")
+                frame.append(f"\n> {prompts(context='transition')}\n")
+            sys.stdout.write("".join(frame))
+            sys.stdout.flush()
 
             command = input("> Enter your move or a command\n> ").strip().upper()
 
-            if command in QUIT_COMMAND:
-                break
-            elif command in RESET_COMMAND:
-                stacks = deepcopy(original_stacks)
-                print("\n> Game reset!")
-                print(f"> {prompts(context='restart')}\n")
-            elif command in HINT_COMMAND:
-                hint = provide_hint(stacks)
-                print(hint)
-                sleep(1)
-            elif command in NEW_COMMAND:
-                stacks, original_stacks, previous_state, best_solve_count, moves, new = initialize()
-                print("\n> New game!\n")
-            elif command in INFO_COMMAND:
-                print()
-                how_to_play()
-                sleep(3)
-            elif command in UNDO_COMMAND:
-                print()
-                if moves:
-                    moves.pop()
-                    stacks = deepcopy(previous_state)
-            elif command == COPYRIGHT:
-                show_copyright()
-            elif command == WARRANTY:
-                show_warranty()
-            else:
-                try:
-                    source, destination = parse_move(command)
-                    processed, previous_state = process_move(stacks, source, destination, previous_state)
-                    if processed:
-                        moves.append((source, destination))
-                        print(f"\n> Moved from stack {source + 1} to stack {destination + 1}.\n")
-                    else:
-                        print(f"\n> Invalid move. Please try again.\n> {prompts(context='error')}\n")
-                except Exception:
-                    print(f"\n> Invalid input. Please use the right format or a valid command.\n> "
-                          f"{prompts(context='error')}\n")
+            handler = handlers.get(command)
+            if handler is not None:
+                if handler():
+                    break
+                continue
+
+            try:
+                source, destination = parse_move(command)
+                snapshot = _snapshot(stacks)
+                if process_move(stacks, source, destination):
+                    previous_state = snapshot
+                    moves.append((source, destination))
+                    print(f"\n> Moved from stack {source + 1} to stack {destination + 1}.\n")
+                else:
+                    print(f"\n> Invalid move. Please try again.\n> {prompts(context='error')}\n")
+            except Exception:
+                print(f"\n> Invalid input. Please use the right format or a valid command.\n> "
+                      f"{prompts(context='error')}\n")
 
     finally:
+        solver.shutdown(wait=False, cancel_futures=True)
         # Restore the main screen buffer
         print("\nPress Enter to exit.")
         input()
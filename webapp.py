@@ -12,12 +12,11 @@ Then open http://localhost:5000 in your browser.
 from __future__ import annotations
 
 import json
-from copy import deepcopy
 
 from flask import Flask, render_template, request, session, jsonify
 
-from game.constants import COLORS
 from game.game_logic import (
+    _snapshot,
     initialize_game,
     process_move,
     check_win_condition,
@@ -33,8 +32,8 @@ app = Flask(__name__)
 app.secret_key = SECRET_KEY
 app.config["SESSION_PERMANENT"] = False
 
-# Mapping from the in-game ANSI color representation to a CSS background color.
-# This is only used for the web UI; the core game logic continues to use the ANSI strings.
+# CSS background color for each color id, in the same order as `game.constants.COLORS`.
+# This is only used for the web UI; the core game logic works with the color ids.
 CSS_COLORS = [
     "#e53935",  # red
     "#43a047",  # green
@@ -45,8 +44,6 @@ CSS_COLORS = [
     "#eeeeee",  # white
 ]
 
-ANSI_TO_CSS = {ansi: css for ansi, css in zip(COLORS, CSS_COLORS)}
-
 
 def _ensure_state() -> None:
     """Ensure a game state exists in the session (creates one if missing).
@@ -61,7 +58,7 @@ def _reset_state() -> list[list]:
     """Reset the game state (used when the UI loads or user explicitly resets)."""
     stacks = initialize_game()
     session["stacks"] = stacks
-    session["previous_state"] = deepcopy(stacks)
+    session["previous_state"] = _snapshot(stacks)
     session["moves"] = []
     session["best_solve"] = len(best_solve(stacks) or [])
     return stacks
@@ -75,8 +72,9 @@ def home():
 
 
 def _export_stacks(stacks):
-    """Convert ANSI color stacks into CSS-friendly color strings."""
-    return [[ANSI_TO_CSS.get(cell, "transparent") for cell in stack] for stack in stacks]
+    """Convert color id stacks into CSS-friendly color strings."""
+    return [[CSS_COLORS[cell] if 0 <= cell < len(CSS_COLORS) else "transparent" for cell in stack]
+            for stack in stacks]
 
 
 def _render_state(extra=None):
@@ -121,13 +119,14 @@ def move():
     dest = payload.get("destination")
 
     try:
-        processed, previous_state = process_move(session["stacks"], source, dest, session.get("previous_state", []))
+        snapshot = _snapshot(session["stacks"])
+        processed = process_move(session["stacks"], source, dest)
     except Exception:
         return jsonify({"ok": False, "error": "Invalid move"}), 400
 
     if processed:
         session["moves"].append((source, dest))
-        session["previous_state"] = deepcopy(previous_state)
+        session["previous_state"] = snapshot
         return jsonify(_render_state({"ok": True}))
 
     return jsonify({"ok": False, "error": "Invalid move"}), 400
@@ -137,7 +136,7 @@ def move():
 def reset():
     stacks = initialize_game()
     session["stacks"] = stacks
-    session["previous_state"] = deepcopy(stacks)
+    session["previous_state"] = _snapshot(stacks)
     session["moves"] = []
     session["best_solve"] = len(best_solve(stacks) or [])
     return jsonify(_render_state({"ok": True}))